@@ -1,10 +1,14 @@
 import datetime
-import json
 import logging
+import random
 import requests
 import socket
 import re
+import threading
+import time
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from paramiko import SSHException
 from paramiko.ssh_exception import NoValidConnectionsError
 
@@ -18,6 +22,11 @@ from teuthology import misc
 
 log = logging.getLogger(__name__)
 
+_session = None
+_session_lock = threading.Lock()
+# Maps (endpoint, task type name) to the task type's id
+_tasktype_ids = dict()
+
 
 def enabled(warn=False):
     """
@@ -53,6 +62,42 @@ def get_types():
     return [type_ for type_ in types if type_]
 
 
+def _build_session():
+    """
+    Build a requests.Session whose connection pool is large enough to keep
+    connections to the FOG server alive while several nodes are being
+    reimaged at once, and which retries transient server errors.
+
+    Only idempotent methods are retried; POSTs (e.g. scheduling a deploy
+    task) are not safe to resend.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[500, 502, 503, 504],
+            raise_on_status=False,
+        ),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _get_session():
+    """
+    :returns: The requests.Session shared by every FOG object in this process
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
 class FOG(object):
     """
     Reimage bare-metal machines with https://fogproject.org/
@@ -67,6 +112,12 @@ class FOG(object):
         self.os_type = os_type
         self.os_version = os_version
         self.log = log.getChild(self.shortname)
+        fog_conf = config.get('fog', dict())
+        self._endpoint = fog_conf.get('endpoint')
+        self._headers = {
+            'fog-api-token': fog_conf.get('api_token'),
+            'fog-user-token': fog_conf.get('user_token'),
+        }
 
     def create(self):
         """
@@ -98,27 +149,21 @@ class FOG(object):
         A convenience method to submit a request to the FOG server
         :param url_suffix: The portion of the URL to append to the endpoint,
                            e.g.  '/system/info'
-        :param data: Optional JSON data to submit with the request
+        :param data: Optional data to submit with the request, serialized
+                     as JSON
         :param method: The HTTP method to use for the request (default: 'GET')
         :param verify: Whether or not to raise an exception if the request is
                        unsuccessful (default: True)
         :returns: A requests.models.Response object
         """
-        req_kwargs = dict(
-            headers={
-                'fog-api-token': config.fog['api_token'],
-                'fog-user-token': config.fog['user_token'],
-            },
-        )
+        req_kwargs = dict(headers=self._headers)
         if data is not None:
-            req_kwargs['data'] = data
-        req = requests.Request(
+            req_kwargs['json'] = data
+        resp = _get_session().request(
             method,
-            config.fog['endpoint'] + url_suffix,
+            self._endpoint + url_suffix,
             **req_kwargs
         )
-        prepped = req.prepare()
-        resp = requests.Session().send(prepped)
         if not resp.ok:
             self.log.error(f"Got status {resp.status_code} from {url_suffix}: '{resp.text}'")
         if verify:
@@ -133,7 +178,7 @@ class FOG(object):
         """
         resp = self.do_request(
             '/host',
-            data=json.dumps(dict(name=self.shortname)),
+            data=dict(name=self.shortname),
         )
         obj = resp.json()
         if obj['count'] == 0:
@@ -152,7 +197,7 @@ class FOG(object):
         def do_get(name):
             resp = self.do_request(
                 '/image',
-                data=json.dumps(dict(name=name)),
+                data=dict(name=name),
             )
             obj = resp.json()
             if obj['count']:
@@ -195,7 +240,7 @@ class FOG(object):
         self.do_request(
             '/host/%s' % host_id,
             method='PUT',
-            data=json.dumps(dict(imageID=image_id)),
+            data=dict(imageID=image_id),
         )
 
     def schedule_deploy_task(self, host_id):
@@ -210,18 +255,12 @@ class FOG(object):
         for task in self.get_deploy_tasks():
             self.cancel_deploy_task(task['id'])
         # Next, we need to find the right tasktype ID
-        resp = self.do_request(
-            '/tasktype',
-            data=json.dumps(dict(name='deploy')),
-        )
-        tasktypes = [obj for obj in resp.json()['tasktypes']
-                     if obj['name'].lower() == 'deploy']
-        deploy_id = int(tasktypes[0]['id'])
+        deploy_id = self.get_tasktype_id('deploy')
         # Next, schedule the task
-        resp = self.do_request(
+        self.do_request(
             '/host/%i/task' % host_id,
             method='POST',
-            data='{"taskTypeID": %i}' % deploy_id,
+            data=dict(taskTypeID=deploy_id),
         )
         host_tasks = self.get_deploy_tasks()
         for task in host_tasks:
@@ -235,6 +274,26 @@ class FOG(object):
             if time_delta < 5:
                 return task['id']
 
+    def get_tasktype_id(self, name):
+        """
+        Task types are static for a given FOG server, so the lookup is only
+        done once per process and endpoint.
+
+        :param name: The name of the task type, e.g. 'deploy'
+        :returns: The id of the task type
+        """
+        name = name.lower()
+        key = (self._endpoint, name)
+        if key not in _tasktype_ids:
+            resp = self.do_request(
+                '/tasktype',
+                data=dict(name=name),
+            )
+            tasktypes = [obj for obj in resp.json()['tasktypes']
+                         if obj['name'].lower() == name]
+            _tasktype_ids[key] = int(tasktypes[0]['id'])
+        return _tasktype_ids[key]
+
     def get_deploy_tasks(self):
         """
         :returns: A list of deploy tasks which are active on our host
@@ -265,10 +324,25 @@ class FOG(object):
         completed)
         """
         self.log.info("Waiting for deploy to finish")
-        with safe_while(sleep=15, tries=120, timeout=config.fog_reimage_timeout) as proceed:
-            while proceed():
-                if not self.deploy_task_active(task_id):
-                    break
+        # Poll with a capped, jittered exponential backoff so that short
+        # deploys are noticed quickly without many nodes polling in lockstep
+        timeout = config.fog_reimage_timeout
+        if not timeout or timeout < 0:
+            # safe_while treated a zero timeout as "bounded by tries"; keep
+            # the bound that sleep=15, tries=120 used to give
+            timeout = 1800
+        delay = 2
+        waited = 0
+        while self.deploy_task_active(task_id):
+            if waited >= timeout:
+                raise MaxWhileTries(
+                    f"Deploy task {task_id} still active after waiting for "
+                    f"{int(waited)} seconds"
+                )
+            interval = min(delay * random.uniform(0.8, 1.2), timeout - waited)
+            time.sleep(interval)
+            waited += interval
+            delay = min(delay * 2, 30)
 
     def cancel_deploy_task(self,  task_id):
         """ Cancel an active deploy task """
@@ -276,7 +350,7 @@ class FOG(object):
         resp = self.do_request(
             '/task/cancel',
             method='DELETE',
-            data='{"id": %s}' % task_id,
+            data=dict(id=int(task_id)),
         )
         resp.raise_for_status()
 
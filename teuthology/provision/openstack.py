@@ -1,3 +1,4 @@
+import functools
 import json
 import logging
 import os
@@ -20,6 +21,16 @@ from teuthology.exceptions import QuotaExceededError
 log = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=16)
+def _load_user_data_template(template_path):
+    """
+    Read a user-data template. Every node created for the same os_type and
+    os_version uses the same template, so it is only read from disk once.
+    """
+    with open(template_path) as f:
+        return f.read()
+
+
 class ProvisionOpenStack(OpenStack):
     """
     A class that provides methods for creating and destroying virtual machine
@@ -48,7 +59,7 @@ class ProvisionOpenStack(OpenStack):
             os_type=os_type,
             os_version=os_version)
         nameserver = config['openstack'].get('nameserver', '8.8.8.8')
-        user_data_template = open(template_path).read()
+        user_data_template = _load_user_data_template(template_path)
         user_data = user_data_template.format(
             up=self.up_string,
             nameserver=nameserver,
@@ -26,6 +26,7 @@ class TestFOG(object):
     def setup_method(self):
         config.load()
         config.update(deepcopy(test_config))
+        fog._tasktype_ids.clear()
         self.start_patchers()
 
     def start_patchers(self):
@@ -124,16 +125,25 @@ class TestFOG(object):
         self.mocks['m_Remote_console'].return_value.power_off.assert_called_once_with()
         self.mocks['m_Remote_console'].return_value.power_on.assert_called_once_with()
 
+    def test_session(self):
+        session = fog._get_session()
+        assert fog._get_session() is session
+        adapter = session.get_adapter(test_config['fog']['endpoint'])
+        assert adapter._pool_maxsize == 32
+        assert adapter.max_retries.total == 5
+        assert 'POST' not in adapter.max_retries.allowed_methods
+
     def test_do_request(self):
         obj = self.klass('name.fqdn', 'type', '1.0')
-        obj.do_request('test_url', data='DATA', method='GET')
+        obj.do_request('test_url', data=dict(key='value'), method='GET')
         assert len(self.mocks['m_requests_Session_send'].call_args_list) == 1
         req = self.mocks['m_requests_Session_send'].call_args_list[0][0][0]
         assert req.url == test_config['fog']['endpoint'] + 'test_url'
         assert req.method == 'GET'
         assert req.headers['fog-api-token'] == test_config['fog']['api_token']
         assert req.headers['fog-user-token'] == test_config['fog']['user_token']
-        assert req.body == 'DATA'
+        assert req.body == b'{"key": "value"}'
+        assert req.headers['Content-Type'] == 'application/json'
 
     @mark.parametrize(
         'count',
@@ -153,7 +163,7 @@ class TestFOG(object):
         assert len(self.mocks['m_requests_Session_send'].call_args_list) == 1
         req = self.mocks['m_requests_Session_send'].call_args_list[0][0][0]
         assert req.url == test_config['fog']['endpoint'] + '/host'
-        assert req.body == '{"name": "name"}'
+        assert req.body == b'{"name": "name"}'
         assert result == host_objs[0]
 
     @mark.parametrize(
@@ -175,7 +185,7 @@ class TestFOG(object):
         assert len(self.mocks['m_requests_Session_send'].call_args_list) == 1
         req = self.mocks['m_requests_Session_send'].call_args_list[0][0][0]
         assert req.url == test_config['fog']['endpoint'] + '/image'
-        assert req.body == '{"name": "type1_windows_xp"}'
+        assert req.body == b'{"name": "type1_windows_xp"}'
         assert result == img_objs[0]
 
     def test_suggest_image_names(self):
@@ -207,7 +217,7 @@ class TestFOG(object):
             local_mocks['get_image_data'].return_value = dict(id='13')
             obj.set_image(host_id)
             local_mocks['do_request'].assert_called_once_with(
-                '/host/999', method='PUT', data='{"imageID": 13}',
+                '/host/999', method='PUT', data=dict(imageID=13),
             )
 
     def test_schedule_deploy_task(self):
@@ -238,6 +248,18 @@ class TestFOG(object):
         assert len(self.mocks['m_requests_Session_send'].call_args_list) == 3
         assert result == task_id
 
+    def test_get_tasktype_id(self):
+        tasktype_result = dict(tasktypes=[
+            dict(name='capture', id=2),
+            dict(name='deploy', id=6),
+        ])
+        self.mocks['m_requests_Session_send']\
+            .return_value.json.return_value = tasktype_result
+        obj = self.klass('name.fqdn', 'type', '1.0')
+        assert obj.get_tasktype_id('deploy') == 6
+        assert obj.get_tasktype_id('deploy') == 6
+        assert len(self.mocks['m_requests_Session_send'].call_args_list) == 1
+
     def test_get_deploy_tasks(self):
         obj = self.klass('name.fqdn', 'type', '1.0')
         resp_obj = dict(
@@ -291,6 +313,33 @@ class TestFOG(object):
             obj.wait_for_deploy_task(9)
             assert len(local_mocks['deploy_task_active'].call_args_list) == \
                 tries + 1
+        sleeps = [c[0][0] for c in self.mocks['m_sleep'].call_args_list]
+        assert len(sleeps) == tries
+        assert sleeps[0] < sleeps[-1] <= 30 * 1.2
+
+    @mark.parametrize(
+        'tries',
+        [3, 121],
+    )
+    def test_wait_for_deploy_task_no_timeout(self, tries):
+        config.fog_reimage_timeout = 0
+        wait_results = [True for i in range(tries)] + [False]
+        obj = self.klass('name.fqdn', 'type', '1.0')
+        with patch.multiple(
+            'teuthology.provision.fog.FOG',
+            deploy_task_active=DEFAULT,
+        ) as local_mocks:
+            local_mocks['deploy_task_active'].side_effect = wait_results
+            if tries >= 60:
+                with raises(MaxWhileTries):
+                    obj.wait_for_deploy_task(9)
+            else:
+                obj.wait_for_deploy_task(9)
+                assert len(
+                    local_mocks['deploy_task_active'].call_args_list
+                ) == tries + 1
+        sleeps = [c[0][0] for c in self.mocks['m_sleep'].call_args_list]
+        assert sum(sleeps) <= 1800
 
     def test_cancel_deploy_task(self):
         obj = self.klass('name.fqdn', 'type', '1.0')
@@ -302,7 +351,7 @@ class TestFOG(object):
             local_mocks['do_request'].assert_called_once_with(
                 '/task/cancel',
                 method='DELETE',
-                data='{"id": 10}',
+                data=dict(id=10),
             )
 
     @mark.parametrize(